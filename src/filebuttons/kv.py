@@ -1,43 +1,23 @@
 """Panel of buttons to launch files into a running IDE."""
 
 import argparse
-import configparser
+import fnmatch
 import json
+import logging
+import os
 import pathlib
+import re
 import shutil
 import subprocess
 import sys
 
-from dataclasses import dataclass
-from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from operator import attrgetter
 from pathlib import Path
-from typing import Iterator, List, Optional
-
-from kivy.app import App
-from kivy.clock import Clock
-from kivy.config import Config
-from kivy.lang import Builder
-from kivy.metrics import dp
-from kivy.properties import ObjectProperty, StringProperty
-from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.button import Button
-from kivy.uix.gridlayout import GridLayout
-from kivy.uix.label import Label
-from kivy.uix.popup import Popup
-from kivy.uix.scrollview import ScrollView
-from kivy.uix.widget import Widget
-
-
-# This is a copy in memory only of the configuration used by App.
-# This copy will not reflect changes made by the App's settings panels.
-# The user needs to exit and restart the App after making changes.
-# We use the config for code that runs before the App class.
-# We need to make the "graphics" changes before the App class is defined.
-# We never save this config file.  The App.build_config() creates the
-# initial config file.
-myconfig = configparser.ConfigParser()
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
 
+logger = logging.getLogger(__name__)
 
 # py src/filebuttons/kv.py -h
 # Kivy Usage: kv.py [KIVY OPTION...] [-- PROGRAM OPTIONS]::
@@ -64,58 +44,32 @@ def main_argparser() -> argparse.ArgumentParser:
         metavar="FILE",
         default=None,
     )
+    parser.add_argument(
+        "--base-dir",
+        help=(
+            "Folder that the [filebuttons.folders] keys are relative to."
+            " Defaults to the current working directory."
+        ),
+        type=pathlib.Path,
+        metavar="DIR",
+        default=Path(),
+    )
     return parser
 
 
-parser = main_argparser()
-# Kivy takes arguments before the "--" on the command line from argv.
-# Kivy leaves argv[0] in place and any arguments after the "--"
-# immediately follow argv[0].
-# todo- the symbol args is used in a lot of places. its confusing. renames needed
-args = parser.parse_args(sys.argv[1:])
-
-if args.config:
-    inifilepath = args.config
-else:
-    if __name__ == "__main__":
-        # config file is in the same dir as this file
-        appdir = Path(__file__).parent.relative_to(Path.cwd())
-        inifilepath = appdir / "filebuttons.ini"
-    else:
-        # config file is hidden file in the users home dir
-        inifilepath = Path().home() / ".filebuttons.ini"
-
-print("reading config file", inifilepath)
-myconfig.read(str(inifilepath))
-
-if not inifilepath.exists():
-    # Create a temporary config in memory with default values.
-    myconfig.add_section("filebuttons.folders")
-    myconfig.set("filebuttons.folders", ".", "README.md")
-
-    myconfig.add_section("filebuttons")
-    myconfig.set("filebuttons", "window_height", Config.get("graphics", "height"))
-    myconfig.set("filebuttons", "screen_position_left", "100")
-    myconfig.set("filebuttons", "screen_position_top", "100")
+class Sizes(NamedTuple):
+    """Sizes from the [filebuttons] section of the config file."""
 
     # Values are pixels.
-    myconfig.set("filebuttons", "button_width", "160")
-    myconfig.set("filebuttons", "short_button_height", "18")
-    myconfig.set("filebuttons", "tall_button_height", "33")
+    button_width: int
+    short_button: int
+    tall_button: int
     # spacing around Buttons and Labels in the layout
-    myconfig.set("filebuttons", "spacing", "3")
-    myconfig.set("filebuttons", "text_wrap_width", "22")  # characters
+    spacing: int
+    text_wrap_width: int  # characters
 
-BUTTON_WIDTH = myconfig.getint("filebuttons", "button_width")
-TEXT_WRAP_WIDTH = myconfig.getint("filebuttons", "text_wrap_width")
-SHORT_BUTTON = myconfig.getint("filebuttons", "short_button_height")
-TALL_BUTTON = myconfig.getint("filebuttons", "tall_button_height")
 
-SPACING = myconfig.getint("filebuttons", "spacing")
-
-
-@dataclass
-class Cell:
+class Cell(NamedTuple):
     """Label or Button text and path passed to the Button callback."""
 
     title: str
@@ -123,74 +77,236 @@ class Cell:
     height: int = 0
 
 
-def filename_ok(filename: str) -> bool:
+# Parsed config file, {section: {key: value}}.
+ParsedConfig = Dict[str, Dict[str, str]]
+
+
+# Substrings that disallow a filename from getting a button.
+_DISALLOW = (";", "&&", "||", "\n")
+_DISALLOW_REPR = ",".join(repr(s) for s in _DISALLOW)
+# Translating with this table deletes the single character ones.
+_DELETE_DISALLOWED = str.maketrans("", "", ";\n")
+
+
+def filename_ok(filename: str, _table: Dict[int, None] = _DELETE_DISALLOWED) -> bool:
     """Return False if filename has disallowed substrings."""
+    # _table is a default argument so the per file call reads a local.
     # The intent is to prevent passing malformed filenames to a shell
     # which is possible if the ["filebuttons"]["program"] key is set to a shell
     # like (cmd on Windows or /bin/sh on Linux).
-    disallow = [";", "&&", "||", "\n"]
-    badfilename = any([s in filename for s in disallow])
-    if badfilename:
-        disallowrepr = ",".join([repr(s) for s in disallow])
-        print(f"No button for {repr(filename)}. It contains some of {disallowrepr}")
+    if (
+        filename.translate(_table) != filename
+        or "&&" in filename
+        or "||" in filename
+    ):
+        logger.warning(
+            "No button for %r. It contains some of %s", filename, _DISALLOW_REPR
+        )
         return False
     return True
 
 
-def walk_one_folder(folder: Path) -> Iterator[Cell]:
-    """Yield unsized Cell for non-empty/non-directory paths in folder."""
-    assert folder.is_dir()
-    is_visited = False
-    dirs = []
-    files = list(folder.iterdir())
-    files.sort(key=attrgetter("name"))
-    for path in files:
-        if path.is_dir():
-            if not path.name.startswith("__"):  # exclude __pycache__ dirs
-                dirs.append(path)
-        else:
-            # skip empty files
-            if not path.stat().st_size > 0:
+# stat() results by path, None if the file vanished.
+StatCache = Dict[str, Optional[os.stat_result]]
+
+
+def cached_stat(entry: os.DirEntry, stat_cache: StatCache) -> Optional[os.stat_result]:
+    """Return the stat() result for the directory entry or None."""
+    # "./src/a.py" and "src/a.py" are the same file.
+    key = os.path.normpath(entry.path)
+    try:
+        return stat_cache[key]
+    except KeyError:
+        pass
+    try:
+        result: Optional[os.stat_result] = entry.stat()
+    except FileNotFoundError:
+        result = None
+    stat_cache[key] = result
+    return result
+
+
+def _sorted_entries(dirpath: str, top: str) -> Optional[List[os.DirEntry]]:
+    """Return the entries of dirpath in name order, None if unreadable."""
+    try:
+        with os.scandir(dirpath) as it:
+            return sorted(it, key=attrgetter("name"))
+    except OSError:
+        if dirpath == top:
+            raise  # walk_project() reports a missing folder
+        return None  # unreadable subfolder, os.walk() skips these too
+
+
+def _wants_button(
+    entry: os.DirEntry, skip_empty: bool, stat_cache: StatCache
+) -> bool:
+    """Return True if entry is a file that is not skipped for being empty."""
+    if not entry.is_file():
+        return False
+    if not skip_empty:
+        return True
+    stat_result = cached_stat(entry, stat_cache)
+    return stat_result is not None and stat_result.st_size > 0
+
+
+def _folder_label(dirpath: str, base_dir: Path) -> str:
+    """Return the folder label text, relative to base_dir if inside it."""
+    label = Path(dirpath)
+    try:
+        label = label.relative_to(base_dir)
+    except ValueError:
+        pass  # absolute folder key
+    return label.as_posix()
+
+
+def walk_one_folder(
+    folder: Path,
+    skip_empty: bool = True,
+    base_dir: Path = Path(),
+    stat_cache: Optional[StatCache] = None,
+) -> Iterator[Cell]:
+    """Yield unsized Cell for non-empty/non-directory paths in folder.
+
+    The folder labels are relative to base_dir when folder is inside it.
+    stat_cache may be shared by the walks of one walk_project() call.
+    """
+    if stat_cache is None:
+        stat_cache = {}
+    # Folders are visited top down in name order. Each DirEntry carries the
+    # file type from the directory listing so telling files from folders
+    # costs no stat(). Only the empty file check needs one, per file.
+    top = os.fspath(folder)
+    pending = [top]
+    while pending:
+        dirpath = pending.pop()
+        entries = _sorted_entries(dirpath, top)
+        if entries is None:
+            continue
+        subdirs = []
+        is_visited = False
+        for entry in entries:
+            if entry.is_dir():
+                if not entry.name.startswith("__"):  # exclude __pycache__ dirs
+                    subdirs.append(entry.path)
+                continue
+            if not _wants_button(entry, skip_empty, stat_cache):
                 continue
             if not is_visited:
                 is_visited = True
-                yield Cell(title=folder.as_posix(), height=0)  # folder label
-            if filename_ok(path.name):
-                yield Cell(title=path.name, target=path, height=0)  # file button
+                label = _folder_label(dirpath, base_dir)
+                yield Cell(title=label, height=0)  # folder label
+            if filename_ok(entry.name):
+                yield Cell(title=entry.name, target=Path(entry.path), height=0)
+        pending.extend(reversed(subdirs))
+
+
+def _match_path_globs(start_folder: str, globs: List[str]) -> List[str]:
+    """Return the files in start_folder matching globs with ** or a folder."""
+    # Path.glob() unlike glob.iglob() matches hidden files and folders
+    # and takes start_folder literally. It yields nothing for a missing
+    # start_folder so check it here, walk_project() reports it.
+    if globs and not os.path.isdir(start_folder):
+        raise FileNotFoundError(start_folder)
+    names = []
+    for glob in globs:
+        for path in Path(start_folder).glob(glob):
+            if path.is_file():
+                names.append(os.fspath(path))
+    return names
 
-    for directory in dirs:
-        for unsized_cell in walk_one_folder(directory):  # recursive call
-            yield unsized_cell
+
+def _match_simple_globs(start_folder: str, globs: List[str]) -> List[str]:
+    """Return the files in start_folder with names matching globs."""
+    # The globs are matched against one listing of start_folder.
+    # Path.glob() would stat each candidate, the DirEntry already knows
+    # if it is a file. One regex for all the globs. Case-insensitive
+    # where the file system is, like fnmatch.fnmatch().
+    flags = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+    pattern = "|".join(fnmatch.translate(glob) for glob in globs)
+    match = re.compile(pattern, flags).match
+    with os.scandir(start_folder) as it:
+        return [entry.path for entry in it if entry.is_file() and match(entry.name)]
 
 
 def emit_from_globs(start_folder: str, label: str, globs: List[str]) -> Iterator[Cell]:
     """Yield unsized Cell instance for label and for each path from globs."""
-    yield Cell(title=label, target=None)  # label has no target
-    paths = []
+    path_globs = []
+    simple_globs = []
     for glob in globs:
-        for path in Path(start_folder).glob(glob):
+        if "**" in glob or "/" in glob or os.sep in glob:
+            path_globs.append(glob)
+        else:
+            simple_globs.append(glob)
+    names = _match_path_globs(start_folder, path_globs)
+    if simple_globs:
+        names.extend(_match_simple_globs(start_folder, simple_globs))
+
+    seen = set()  # a path can match more than one glob
+    paths = []
+    for name in names:
+        path = Path(name)
+        if path not in seen:
+            seen.add(path)
             if filename_ok(path.name):
                 paths.append(path)
-    unique_paths = list(set(paths))
-    unique_paths.sort(key=attrgetter("name"))
-    for path in unique_paths:
+    paths.sort(key=attrgetter("name"))
+    # The label comes after the matching so a missing start_folder
+    # raises before anything is yielded.
+    yield Cell(title=label, target=None)  # label has no target
+    for path in paths:
         yield Cell(title=path.name, target=path, height=0)
 
 
-def walk_project(config: configparser.ConfigParser) -> Iterator[Cell]:
-    """Yield unsized Cell instances as described by config file."""
-    for key in config["filebuttons.folders"].keys():
-        if not Path(key).exists():
-            print(f"[filebuttons.folders] key '{key}' does not exist, skipping")
-            continue
+def walk_project(config: ParsedConfig, base_dir: Path = Path()) -> Iterator[Cell]:
+    """Yield unsized Cell instances as described by config file.
+
+    The folder keys are relative to base_dir.
+    """
+    # Skipping empty files costs a stat() per file in recursed folders.
+    value = config["filebuttons"].get("skip_empty_files", "1")
+    skip_empty = value.lower() not in ("0", "no", "false", "off")
+    folders = config["filebuttons.folders"]
+    # Nothing here changes the files so the stat() results hold for this
+    # call. Folders configured inside other recursed folders get listed
+    # twice but stat()ed once. A later call sees changed files.
+    stat_cache: StatCache = {}
+
+    def scan(key: str) -> Union[List[Cell], OSError]:
+        """Return the cells for one folder key or the error listing it."""
         name = "root" if key == "." else key
-        if globs := config["filebuttons.folders"][key]:
-            filenames = globs.splitlines()
-            for unsized_cell in emit_from_globs(key, name, filenames):
-                yield unsized_cell
-        else:
-            for unsized_cell in walk_one_folder(Path(key)):
-                yield unsized_cell
+        folder = base_dir / key
+        # Rather than checking the folder exists first, listing it raises
+        # before any cells are made.
+        try:
+            if globs := folders[key]:
+                filenames = globs.splitlines()
+                return list(emit_from_globs(os.fspath(folder), name, filenames))
+            return list(walk_one_folder(folder, skip_empty, base_dir, stat_cache))
+        except (FileNotFoundError, NotADirectoryError, PermissionError) as error:
+            return error
+
+    # Listing folders waits on the file system with the GIL released,
+    # so more than a couple of folders are listed in threads.
+    # map() keeps the config file order.
+    keys = list(folders)
+    if len(keys) > 2:
+        with ThreadPoolExecutor(max_workers=min(8, len(keys))) as executor:
+            results = list(executor.map(scan, keys))
+    else:
+        results = [scan(key) for key in keys]
+    for key, cells in zip(keys, results):
+        if isinstance(cells, PermissionError):
+            logger.warning(
+                "[filebuttons.folders] key '%s' can't be read, skipping", key
+            )
+            continue
+        if isinstance(cells, OSError):
+            logger.warning(
+                "[filebuttons.folders] key '%s' does not exist, skipping", key
+            )
+            continue
+        for unsized_cell in cells:
+            yield unsized_cell
 
 
 def show_files(cells: Iterator[Cell]) -> None:
@@ -209,301 +325,298 @@ def show_heights(sized_cells: Iterator[Cell]) -> None:
         print(f"{indent}{repr(cell.title):30}  {cell.height}")
 
 
-def wrap(text: str) -> str:
-    """Add newline to wrap a long label/button string."""
+# Default for the text_wrap_width setting. Characters.
+TEXT_WRAP_WIDTH = 22
+
+
+# Filenames like README.md and __init__.py repeat across folders.
+@lru_cache(maxsize=2048)
+def wrap_pair(
+    text: str, wrap_width: int = TEXT_WRAP_WIDTH
+) -> Union[Tuple[str], Tuple[str, str]]:
+    """Return the lines of a label/button string wrapped at wrap_width."""
     width = len(text)
-    if width > TEXT_WRAP_WIDTH:
-        index, _ = divmod(width, 2)
-        # for odd width make first part the longer part
-        if width % 2 == 1:
-            index += 1
-        text = text[:index] + "\n" + text[index:]
-    return text
-
-
-def compute_heights(unsized_cells: Iterator[Cell]) -> Iterator[Cell]:
-    """Wrap label/button text and determine button height for each cell."""
-    # Returns new Cell instances with updated title and height fields.
+    # Most titles fit. Return them before any split point arithmetic.
+    if width <= wrap_width:
+        return (text,)
+    # for odd width make first part the longer part
+    index = (width + 1) // 2
+    return (text[:index], text[index:])
+
+
+def wrap(text: str, wrap_width: int = TEXT_WRAP_WIDTH) -> str:
+    """Add newline to wrap a label/button string longer than wrap_width."""
+    return "\n".join(wrap_pair(text, wrap_width))
+
+
+def size_cells(unsized_cells: Iterator[Cell], sizes: Sizes) -> Iterator[Cell]:
+    """Wrap label/button text and set the height of each cell."""
+    wrap_width = sizes.text_wrap_width
+    tall = sizes.tall_button
+    short = sizes.short_button
+    # The number of lines from wrap_pair() decides the height.
     for cell in unsized_cells:
         if cell.target is None:  # for button, not for label
-            text = wrap(cell.title)
+            text = cell.title
         else:
-            text = wrap(cell.target.name)
-        num_lines = text.count("\n") + 1
-        if num_lines > 1:
-            height = TALL_BUTTON
+            text = cell.target.name
+        lines = wrap_pair(text, wrap_width)
+        if len(lines) > 1:
+            yield Cell("\n".join(lines), cell.target, tall)
         else:
-            height = SHORT_BUTTON
-        yield Cell(text, cell.target, height)
+            yield Cell(text, cell.target, short)
 
 
-def make_columns(
-    sized_cells: Iterator[Cell], window_height: int
-) -> Iterator[List[Cell]]:
-    """Distribute iterable labelpaths items into columns."""
-    cell_column: List[Cell] = []
+def build_columns(
+    unsized_cells: Iterator[Cell], window_height: int, sizes: Sizes
+) -> Tuple[Tuple[Cell, ...], ...]:
+    """Wrap label/button text, size each cell and distribute cells into columns."""
+    short = sizes.short_button
+    spacing = sizes.spacing
     # todo- account for button spacing is [3] all faces
-    minimum_height = 4 * (SHORT_BUTTON + SPACING)
+    minimum_height = 4 * (short + spacing)
     assert window_height >= minimum_height, "must be at least 4 buttons high"
     # reserve room for 4 short buttons at the top of the first column.
-    column_capacity = window_height - minimum_height
-    try:
-        while True:
-            cell = next(sized_cells)
-            space_required = cell.height + SPACING
-            if space_required <= column_capacity:  # room?
-                cell_column.append(cell)  # yes-
-                column_capacity -= space_required
-            else:  # no-
-                yield cell_column
-                # start a new cell_column
-                cell_column = []
-                cell_column.append(cell)
-                column_capacity = window_height - space_required
-    except StopIteration:
-        if cell_column:
-            yield cell_column
-
-
-unsized_cells = walk_project(myconfig)
-sized_cells = compute_heights(unsized_cells)
-window_height = myconfig.getint("filebuttons", "window_height")
-columns = list(make_columns(sized_cells, window_height))
-num_columns = len(columns)
-layout_width = (num_columns * BUTTON_WIDTH) + SPACING
-
-
-# Set kivy screen position and height of the window
-print("set graphics-")
-Config.set("graphics", "min_state_time", 0.0)
-Config.set("graphics", "width", layout_width)
-Config.set("graphics", "height", window_height)
-Config.set("graphics", "position", "custom")
-Config.set("graphics", "left", myconfig.getint("filebuttons", "screen_position_left"))
-Config.set("graphics", "top", myconfig.getint("filebuttons", "screen_position_top"))
-
-# Workaround to fix messed up drawing when imports are before the "graphics" changes.
-from kivy.core.window import Window
-from kivy.uix.settings import (
-    SettingItem,
-    SettingSpacer,
+    first_capacity = window_height - minimum_height
+
+    # Size the cells and sum the running column height in one pass.
+    # ends[j] is the space taken up by cells[:j] stacked in one column.
+    cells = []
+    ends = [0]
+    for cell in size_cells(unsized_cells, sizes):
+        cells.append(cell)
+        ends.append(ends[-1] + cell.height + spacing)
+
+    # Choose the column breaks by dynamic programming rather than filling
+    # each column until it overflows. best[j] is the (number of columns,
+    # sum of squared unused space per column) for laying out cells[:j].
+    # Comparing the tuples keeps the fewest columns, the same number a
+    # greedy fill needs, and among those picks the most evenly filled.
+    # starts[j] is the index of the first cell in the last of those columns.
+    # When cells that start at index 0 don't fit under the app buttons the
+    # first column is left to the app buttons, emptied[j] records that.
+    # Only a lone cell taller than the window overflows, in a fresh column.
+    empty_first = (1, first_capacity * first_capacity)
+    best = [(0, 0)]
+    starts = [0]
+    emptied = [False]
+    for j in range(1, len(cells) + 1):
+        best_j = None
+        start_j = j - 1
+        emptied_j = False
+        for k in range(j - 1, -1, -1):
+            used = ends[j] - ends[k]
+            if used > window_height and k < j - 1:
+                break  # the column only gets taller as k decreases
+            unused = max(window_height - used, 0)
+            prior = best[k]
+            if k == 0:
+                if used <= first_capacity:
+                    unused = first_capacity - used
+                else:
+                    prior = empty_first
+            num_columns, cost = prior
+            candidate = (num_columns + 1, cost + unused * unused)
+            if best_j is None or candidate < best_j:
+                best_j = candidate
+                start_j = k
+                emptied_j = prior is empty_first
+        best.append(best_j)
+        starts.append(start_j)
+        emptied.append(emptied_j)
+
+    # The columns are slices of a tuple so they are read only.
+    frozen = tuple(cells)
+    cell_columns = []
+    end = len(frozen)
+    while end > 0:
+        start = starts[end]
+        cell_columns.append(frozen[start:end])
+        if start == 0 and emptied[end]:
+            cell_columns.append(())  # just the app buttons
+        end = start
+    cell_columns.reverse()
+    return tuple(cell_columns)
+
+
+# Config file used when there is no --config option, a hidden file in the
+# users home dir.
+_DEFAULT_CONFIG_PATH = Path.home() / ".filebuttons.ini"
+
+
+# One match per non-blank line of an ini file.
+_INI_RE = re.compile(
+    r"""
+    ^(?P<indent>[ \t]*)
+    (?:
+        (?P<comment>[#;].*?)                                # ; or # comment
+        | \[(?P<section>.+)\].*?                           # [section]
+        | (?P<key>[^=:\n]*?)[ \t]*[=:][ \t]*(?P<value>.*?)  # key = value
+        | (?P<other>\S.*?)                                  # anything else
+    )[ \t]*$
+    """,
+    re.MULTILINE | re.VERBOSE,
 )
-from kivy.uix.settings import SettingsWithSidebar
-from kivy.uix.textinput import TextInput
-
-
-def okcancel(content, validate, dismiss):
-    """Add layout containing Ok and Cancel buttons/handers to content."""
-    btnlayout = BoxLayout(size_hint_y=None, height="50dp", spacing="5dp")
-    btn = Button(text="Ok")
-    btn.bind(on_release=validate)
-    btnlayout.add_widget(btn)
-    btn = Button(text="Cancel")
-    btn.bind(on_release=dismiss)
-    btnlayout.add_widget(btn)
-    content.add_widget(btnlayout)
 
 
-class MyMultiLineSettingString(SettingItem):
-    """Copy of SettingString with taller text input area for multiline string."""
+def _ini_error(text: str, match: "re.Match[str]", message: str) -> ValueError:
+    """Return ValueError for the line of text where match starts."""
+    line_number = text.count("\n", 0, match.start()) + 1
+    return ValueError(f"line {line_number}: {message}: {match.group().strip()!r}")
 
-    # Implementation of a string setting on top of a :class:`SettingItem`.
-    # It is visualized with a :class:`~kivy.uix.label.Label` widget that, when
-    # clicked, will open a :class:`~kivy.uix.popup.Popup` with a
-    # :class:`~kivy.uix.textinput.Textinput` so the user can enter a custom
-    # value.
 
-    popup = ObjectProperty(None, allownone=True)
-    """(internal) Used to store the current popup when it's shown.
+def parse_ini(text: str) -> ParsedConfig:
+    """Return {section: {key: value}} from the text of an ini file.
 
-    :attr:`popup` is an :class:`~kivy.properties.ObjectProperty` and defaults
-    to None.
+    Reads the file like RawConfigParser with its default settings. Keys
+    are lower cased and end at the first = or :. Indented lines continue
+    the value of the key above, joined by newlines, and blank lines
+    between them are kept. Text after a [section] header is ignored.
+    There is no interpolation. Raises ValueError for lines
+    configparser would reject.
     """
+    sections: Dict[str, Dict[str, List[str]]] = {}
+    section: Optional[Dict[str, List[str]]] = None
+    lines: List[str] = []  # value of the current key
+    previous_end = 0
+    blank_lines = 0  # since the last line that was not a comment
+    for match in _INI_RE.finditer(text):
+        # Blank lines don't match, they are the gap since the last match.
+        blank_lines += text.count("\n", previous_end, match.start()) - 1
+        previous_end = match.end()
+        if match.group("comment") is not None:
+            continue
+        if match.group("indent") and lines:
+            lines.extend([""] * blank_lines)
+            lines.append(match.group().strip())
+        elif match.group("section") is not None:
+            name = match.group("section")
+            if name in sections:
+                raise _ini_error(text, match, "duplicate section")
+            section = sections[name] = {}
+            lines = []
+        elif match.group("key") is None:
+            raise _ini_error(text, match, "expected key = value")
+        elif section is None:
+            raise _ini_error(text, match, "key before the first [section]")
+        else:
+            key = match.group("key").lower()
+            if key in section:
+                raise _ini_error(text, match, "duplicate key")
+            lines = section[key] = [match.group("value")]
+        blank_lines = 0
+    return {
+        name: {key: "\n".join(lines) for key, lines in options.items()}
+        for name, options in sections.items()
+    }
 
-    textinput = ObjectProperty(None)
-    """(internal) Used to store the current textinput from the popup and
-    to listen for changes.
-
-    :attr:`textinput` is an :class:`~kivy.properties.ObjectProperty` and
-    defaults to None.#00a57eff
-    """
-
-    def on_panel(self, instance, value):
-        if value is None:
-            return
-        self.fbind("on_release", self._create_popup)
-
-    def _dismiss(self, *args):
-        if self.textinput:
-            self.textinput.focus = False
-        if self.popup:
-            self.popup.dismiss()
-        self.popup = None
-
-    def _validate(self, instance):
-        self._dismiss()
-        value = self.textinput.text.strip()
-        self.value = value
-
-    def _create_popup(self, instance):
-        # create popup layout
-        content = BoxLayout(orientation="vertical", spacing="5dp")
-        popup_width = min(0.95 * Window.width, dp(500))
-        self.popup = popup = Popup(
-            title=self.title,
-            content=content,
-            size_hint=(None, None),
-            size=(popup_width, "250dp"),
-        )
-        # The textinput is taller than SettingString's.
-        self.textinput = textinput = TextInput(
-            text=self.value,
-            font_size="24sp",
-            multiline=True,
-            size_hint_y=None,
-            height="200sp",
-            scroll_y=0,  # todo- doesn't work
-        )
-
-        textinput.bind(on_text_validate=self._validate)
-        self.textinput = textinput
-
-        # construct the content, widget is used as a spacer
-        content.add_widget(Widget())
-        content.add_widget(textinput)
-        content.add_widget(Widget())
-        content.add_widget(SettingSpacer())
-        okcancel(content, self._validate, self._dismiss)
-        popup.open()
 
+def load_config(inifilepath: Path) -> ParsedConfig:
+    """Return the parsed config file, or defaults if the file does not exist.
 
-class MyAddNewFolder:
-    """
-    Create Popup to get name of folder, add folder to the
-    App's config and write the .ini file.
+    The result is shared by later calls, callers must not change it.
     """
+    try:
+        mtime_ns: Optional[int] = os.stat(inifilepath).st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = None
+    return _load_config(os.path.abspath(inifilepath), mtime_ns)
+
+
+@lru_cache(maxsize=8)
+def _load_config(inifilepath: str, mtime_ns: Optional[int]) -> ParsedConfig:
+    """Parse the config file. mtime_ns is in the key so an edited file is re-read."""
+    # This is a copy in memory only of the configuration used by App.
+    # This copy will not reflect changes made by the App's settings panels.
+    # The user needs to exit and restart the App after making changes.
+    # We use the config for code that runs before the App class.
+    # We need to make the "graphics" changes before the App class is defined.
+    # We never save this config file.  The App.build_config() creates the
+    # initial config file.
+    logger.info("reading config file %s", inifilepath)
+    if mtime_ns is not None:
+        text = Path(inifilepath).read_text(encoding="utf-8")
+        try:
+            return parse_ini(text)
+        except ValueError as error:
+            raise ValueError(f"{inifilepath} {error}") from None
 
-    def __init__(self, appconfig):
-        self.popup = None
-        self.textinput = None
-        self.appconfig = appconfig
-
-    def _dismiss(self, *args):
-        if self.popup:
-            self.popup.dismiss()
-
-    def _validate(self, instance):
-        self._dismiss()
-        value = self.textinput.text.strip()
-        p = Path(value)
-        if not p.exists():
-            print(f"Not adding new folder {p} since it does not exist.")
-        elif not p.is_dir():
-            print(f"Not adding new folder {p} since it is not a directory.")
-        elif self.appconfig.has_option("filebuttons.folders", str(p)):
-            print(f"Not adding new folder {p} since it already has a setting value.")
+    # Create a temporary config in memory with default values.
+    return {
+        "filebuttons.folders": {".": "README.md"},
+        "filebuttons": {
+            # Kivy's default window height
+            "window_height": "600",
+            "screen_position_left": "100",
+            "screen_position_top": "100",
+            # Values are pixels.
+            "button_width": "160",
+            "short_button_height": "18",
+            "tall_button_height": "33",
+            # spacing around Buttons and Labels in the layout
+            "spacing": "3",
+            "text_wrap_width": str(TEXT_WRAP_WIDTH),
+        },
+    }
+
+
+class Startup(NamedTuple):
+    """Settings and button columns worked out before the App is run."""
+
+    inifilepath: Path
+    base_dir: Path
+    config: ParsedConfig
+    sizes: Sizes
+    columns: Tuple[Tuple[Cell, ...], ...]
+    window_height: int
+    layout_width: int
+
+
+def _bootstrap(argv: List[str]) -> Startup:
+    """Read the config file given by the command line and lay out the cells."""
+    parser = main_argparser()
+    args = parser.parse_args(argv)
+
+    if args.config:
+        inifilepath = args.config
+    else:
+        if __name__ == "__main__":
+            # config file is in the same dir as this file
+            appdir = Path(__file__).parent.relative_to(Path.cwd())
+            inifilepath = appdir / "filebuttons.ini"
         else:
-            print(f"adding new folder '{value}' to setting [filebuttons.folders].")
-            self.appconfig.set("filebuttons.folders", value, "")
-            self.appconfig.write()
-
-    def create_popup(self, instance):
-        # create popup layout
-        content = BoxLayout(orientation="vertical", spacing="5dp")
-        popup_width = min(0.95 * Window.width, dp(500))
-        self.popup = Popup(
-            title="Add new folder",
-            content=content,
-            size_hint=(None, None),
-            size=(popup_width, "250dp"),
-        )
-
-        # create the textinput used to input the folder name.
-        self.textinput = TextInput(
-            text="", font_size="24sp", multiline=False, size_hint_y=None, height="42sp"
-        )
-        self.textinput.bind(on_text_validate=self._validate)
-
-        # construct the content, widget is used as a spacer
-        content.add_widget(Widget())
-        content.add_widget(self.textinput)
-        content.add_widget(Widget())
-        content.add_widget(SettingSpacer())
-        okcancel(content, self._validate, self._dismiss)
-        self.popup.open()
-
-
-class MyConfigureScreenPosition:
-    def __init__(self, appconfig):
-        self.popup = None
-        self.appconfig = appconfig
-
-    def _dismiss(self, *args):
-        if self.popup:
-            self.popup.dismiss()
-
-    def popup_screen_pos(self, *args):
-        """Show a popup with screen position of main window."""
-        layout = BoxLayout(orientation="vertical", spacing=10)
-        layout.add_widget(Label(text=f"left {Window.left}  top {Window.top}"))
-        self.popup = Popup(
-            title="Screen position",
-            content=layout,
-            size_hint=(None, None),
-            size=(200, 200),
-            auto_dismiss=True,
-        )
-        layout.add_widget(
-            Button(
-                text="save to settings",
-                size_hint_y=0.45,
-                on_release=self.save_screen_pos,
-            )
-        )
-        layout.add_widget(
-            Button(text="cancel/done", size_hint_y=0.45, on_release=self.popup.dismiss)
-        )
-        self.popup.open()
-
-    def save_screen_pos(self, *args):
-        self.appconfig.set("filebuttons", "screen_position_left", Window.left)
-        self.appconfig.set("filebuttons", "screen_position_top", Window.top)
-        self.appconfig.write()
-
-
-class MyFileButton(Button):
-    """Create a Button for a file described by the Path 'mytarget'."""
-
-    def __init__(self, **kwargs):  # type: ignore
-        self.mytarget = kwargs.pop("mytarget")
-        super().__init__(**kwargs)
-        self.bind(on_release=self.mycallback)  # note- bind is part of EventDispatcher
-        self.size_hint_x = None
-        self.width = BUTTON_WIDTH
-        self.size_hint_y = None
-
-    def mycallback(self, instance):
-        filename = str(self.mytarget)
-        print(f"file button text= {self.text}, filename={filename}")
-        run_program(filename)
+            inifilepath = _DEFAULT_CONFIG_PATH
 
+    myconfig = load_config(inifilepath)
 
-class MyAppButton(Button):
-    """Style for App control buttons."""
+    settings = myconfig["filebuttons"]
+    sizes = Sizes(
+        button_width=int(settings["button_width"]),
+        short_button=int(settings["short_button_height"]),
+        tall_button=int(settings["tall_button_height"]),
+        spacing=int(settings["spacing"]),
+        text_wrap_width=int(settings["text_wrap_width"]),
+    )
 
-    def __init__(self, **kwargs):  # type: ignore
-        super().__init__(**kwargs)
-        self.size_hint_max_y = SHORT_BUTTON
-        self.size_hint_x = None
-        self.width = BUTTON_WIDTH
-        self.color = (0, 0.8, 0, 1)
-        self.background_color = (0.5, 0.5, 0.5, 1)
-        self.outline_color = [0.3, 0.3, 0.3, 0.3]
-        self.outline_width = 1
+    unsized_cells = walk_project(myconfig, args.base_dir)
+    window_height = int(settings["window_height"])
+    columns = build_columns(unsized_cells, window_height, sizes)
+    layout_width = (len(columns) * sizes.button_width) + sizes.spacing
+    return Startup(
+        inifilepath=inifilepath,
+        base_dir=args.base_dir,
+        config=myconfig,
+        sizes=sizes,
+        columns=columns,
+        window_height=window_height,
+        layout_width=layout_width,
+    )
 
 
 """Rule to display the multiline setting value on the settings panel."""
 # This is from the Kivy Crash Course.
+# The button rules set the properties shared by every button once here
+# rather than as constructor arguments for each button.
 kv = """\
 <ScrollableLabel>:
     text: ""
@@ -517,339 +630,657 @@ kv = """\
 <MyMultiLineSettingString>:
     ScrollableLabel:
         text: root.value or ''
-"""
 
-
-class ScrollableLabel(ScrollView):
-    text = StringProperty("")
+<MyAppButton>:
+    size_hint_x: None
+    size_hint_max_y: app.short_button
+    width: app.button_width
+    color: 0, 0.8, 0, 1
+    background_color: 0.5, 0.5, 0.5, 1
+    outline_color: 0.3, 0.3, 0.3, 0.3
+    outline_width: 1
+
+<FolderButton@Button>:
+    size_hint: None, None
+    width: app.button_width
+    color: app.folder_text_color
+    background_color: app.folder_background_color
+
+<MyFileButton>:
+    size_hint: None, None
+    width: app.button_width
+    color: app.file_text_color
+    background_color: app.file_background_color
+    font_family: app.font_family
+    font_size: app.font_size
+"""
 
 
-def run_program(filename) -> None:
+def run_program(program: str, filename: str) -> None:
     """Run a program with filename as the 2nd argument."""
-    program = myconfig["filebuttons"]["program"]
     executable_path = shutil.which(program)
     if executable_path is None:
-        print(f'Not running {program} because shutil.which("{program}") is None.')
+        logger.warning(
+            'Not running %s because shutil.which("%s") is None.', program, program
+        )
         return
     args_list = [executable_path, filename]
-    print("subprocess.run...")
+    logger.debug("subprocess.run...")
     completed = subprocess.run(args_list, shell=False)
-    print(f"subprocess completed returncode= {completed.returncode}")
+    logger.info("subprocess completed returncode= %s", completed.returncode)
+
+
+# The widget classes are nested here to keep kv.py a single file that
+# imports Kivy only when run, so flake8 counts them all in one function.
+def kivy_app_class(startup: Startup):  # noqa: C901
+    """Import the Kivy widgets and return the App class defined with them."""
+    # The imports are here so they happen only when the App is run.
+    # Workaround to fix messed up drawing when imports are before the
+    # "graphics" changes. Make the "graphics" changes before calling this.
+    from kivy.app import App
+    from kivy.clock import Clock
+    from kivy.core.window import Window
+    from kivy.factory import Factory
+    from kivy.lang import Builder
+    from kivy.metrics import dp
+    from kivy.properties import (
+        ColorProperty,
+        NumericProperty,
+        ObjectProperty,
+        StringProperty,
+    )
+    from kivy.uix.boxlayout import BoxLayout
+    from kivy.uix.button import Button
+    from kivy.uix.gridlayout import GridLayout
+    from kivy.uix.label import Label
+    from kivy.uix.popup import Popup
+    from kivy.uix.scrollview import ScrollView
+    from kivy.uix.settings import (
+        SettingItem,
+        SettingSpacer,
+    )
+    from kivy.uix.settings import SettingsWithSidebar
+    from kivy.uix.textinput import TextInput
+    from kivy.uix.widget import Widget
+
+    myconfig = startup.config
+    sizes = startup.sizes
+    columns = startup.columns
+
+    def okcancel(content, validate, dismiss):
+        """Add layout containing Ok and Cancel buttons/handers to content."""
+        btnlayout = BoxLayout(size_hint_y=None, height="50dp", spacing="5dp")
+        btn = Button(text="Ok")
+        btn.bind(on_release=validate)
+        btnlayout.add_widget(btn)
+        btn = Button(text="Cancel")
+        btn.bind(on_release=dismiss)
+        btnlayout.add_widget(btn)
+        content.add_widget(btnlayout)
+
+    class MyMultiLineSettingString(SettingItem):
+        """Copy of SettingString with taller text input area for multiline string."""
+
+        # Implementation of a string setting on top of a :class:`SettingItem`.
+        # It is visualized with a :class:`~kivy.uix.label.Label` widget that, when
+        # clicked, will open a :class:`~kivy.uix.popup.Popup` with a
+        # :class:`~kivy.uix.textinput.Textinput` so the user can enter a custom
+        # value.
+
+        popup = ObjectProperty(None, allownone=True)
+        """(internal) Used to store the current popup when it's shown.
+
+        :attr:`popup` is an :class:`~kivy.properties.ObjectProperty` and defaults
+        to None.
+        """
+
+        textinput = ObjectProperty(None)
+        """(internal) Used to store the current textinput from the popup and
+        to listen for changes.
+
+        :attr:`textinput` is an :class:`~kivy.properties.ObjectProperty` and
+        defaults to None.#00a57eff
+        """
+
+        def on_panel(self, instance, value):
+            if value is None:
+                return
+            self.fbind("on_release", self._create_popup)
+
+        def _dismiss(self, *args):
+            if self.textinput:
+                self.textinput.focus = False
+            if self.popup:
+                self.popup.dismiss()
+            self.popup = None
+
+        def _validate(self, instance):
+            self._dismiss()
+            value = self.textinput.text.strip()
+            self.value = value
+
+        def _create_popup(self, instance):
+            # create popup layout
+            content = BoxLayout(orientation="vertical", spacing="5dp")
+            popup_width = min(0.95 * Window.width, dp(500))
+            self.popup = popup = Popup(
+                title=self.title,
+                content=content,
+                size_hint=(None, None),
+                size=(popup_width, "250dp"),
+            )
+            # The textinput is taller than SettingString's.
+            self.textinput = textinput = TextInput(
+                text=self.value,
+                font_size="24sp",
+                multiline=True,
+                size_hint_y=None,
+                height="200sp",
+                scroll_y=0,  # todo- doesn't work
+            )
 
+            textinput.bind(on_text_validate=self._validate)
+            self.textinput = textinput
+
+            # construct the content, widget is used as a spacer
+            content.add_widget(Widget())
+            content.add_widget(textinput)
+            content.add_widget(Widget())
+            content.add_widget(SettingSpacer())
+            okcancel(content, self._validate, self._dismiss)
+            popup.open()
+
+    class MyAddNewFolder:
+        """
+        Create Popup to get name of folder, add folder to the
+        App's config and write the .ini file.
+        """
+
+        def __init__(self, appconfig):
+            self.popup = None
+            self.textinput = None
+            self.appconfig = appconfig
+
+        def _dismiss(self, *args):
+            if self.popup:
+                self.popup.dismiss()
+
+        def _validate(self, instance):
+            self._dismiss()
+            value = self.textinput.text.strip()
+            p = Path(value)
+            folder = startup.base_dir / p
+            if not folder.exists():
+                logger.warning("Not adding new folder %s since it does not exist.", p)
+            elif not folder.is_dir():
+                logger.warning(
+                    "Not adding new folder %s since it is not a directory.", p
+                )
+            elif self.appconfig.has_option("filebuttons.folders", str(p)):
+                logger.warning(
+                    "Not adding new folder %s since it already has a setting value.", p
+                )
+            else:
+                logger.info(
+                    "adding new folder '%s' to setting [filebuttons.folders].", value
+                )
+                self.appconfig.set("filebuttons.folders", value, "")
+                self.appconfig.write()
+
+        def create_popup(self, instance):
+            # create popup layout
+            content = BoxLayout(orientation="vertical", spacing="5dp")
+            popup_width = min(0.95 * Window.width, dp(500))
+            self.popup = Popup(
+                title="Add new folder",
+                content=content,
+                size_hint=(None, None),
+                size=(popup_width, "250dp"),
+            )
 
-class FilebuttonsApp(App):
-    new_folder = None  # todo- should this be an object property?
+            # create the textinput used to input the folder name.
+            self.textinput = TextInput(
+                text="",
+                font_size="24sp",
+                multiline=False,
+                size_hint_y=None,
+                height="42sp",
+            )
+            self.textinput.bind(on_text_validate=self._validate)
+
+            # construct the content, widget is used as a spacer
+            content.add_widget(Widget())
+            content.add_widget(self.textinput)
+            content.add_widget(Widget())
+            content.add_widget(SettingSpacer())
+            okcancel(content, self._validate, self._dismiss)
+            self.popup.open()
+
+    class MyConfigureScreenPosition:
+        def __init__(self, appconfig):
+            self.popup = None
+            self.appconfig = appconfig
+
+        def _dismiss(self, *args):
+            if self.popup:
+                self.popup.dismiss()
+
+        def popup_screen_pos(self, *args):
+            """Show a popup with screen position of main window."""
+            layout = BoxLayout(orientation="vertical", spacing=10)
+            layout.add_widget(Label(text=f"left {Window.left}  top {Window.top}"))
+            self.popup = Popup(
+                title="Screen position",
+                content=layout,
+                size_hint=(None, None),
+                size=(200, 200),
+                auto_dismiss=True,
+            )
+            layout.add_widget(
+                Button(
+                    text="save to settings",
+                    size_hint_y=0.45,
+                    on_release=self.save_screen_pos,
+                )
+            )
+            layout.add_widget(
+                Button(
+                    text="cancel/done",
+                    size_hint_y=0.45,
+                    on_release=self.popup.dismiss,
+                )
+            )
+            self.popup.open()
 
-    def get_application_config(self):
-        """Tell the App the name of the .ini config file."""
-        configfile = super(FilebuttonsApp, self).get_application_config(
-            str(inifilepath)
-        )
-        print(f"App.get_application_config- config file is {configfile}")
-        return configfile
-
-    def build_config(self, config):
-        """Override App's."""
-        print("App.build_config-")
-
-        # Save the in-memory configuration myconfig settings
-        # as app configuration defalults.
-        for section in myconfig.sections():
-            config.setdefaults(section, dict(myconfig.items(section)))
-
-        # Also set defaults for keys referenced after App.run().
-        config.setdefaults(
-            "filebuttons",
-            {
-                "window_title": "filebuttons",
-                "program": "code",  # Visual Studio Code
-                "folder_background_color": "#0c0c0cff",
-                "folder_text_color": "#00a57fff",
-                "file_background_color": "#595959ff",
-                "file_text_color": "#00b200ff",
-                "font_family": "CourierNew",
-                "font_size": 14,
-            },
-        )
+        def save_screen_pos(self, *args):
+            self.appconfig.set("filebuttons", "screen_position_left", Window.left)
+            self.appconfig.set("filebuttons", "screen_position_top", Window.top)
+            self.appconfig.write()
 
-    @staticmethod
-    def set_mainwindow_title(value, *largs):
-        """Set the App's Kivy core window title bar string."""
-        Window.set_title(value)
-
-    def build(self) -> BoxLayout:
-        """Override App's."""
-        print("App.build-")
-        self.settings_cls = SettingsWithSidebar
-        self.use_kivy_settings = False
-        assert self.config is not None, "Avoid pylance None nag."
-
-        # Set the text appearing in the titlebar of the main window.
-        Clock.schedule_once(
-            partial(
-                self.set_mainwindow_title, self.config["filebuttons"]["window_title"]
+    class MyFileButton(Button):
+        """Create a Button for a file described by the Path 'mytarget'."""
+
+        def __init__(self, **kwargs):  # type: ignore
+            self.mytarget = kwargs.pop("mytarget")
+            super().__init__(**kwargs)
+            # note- bind is part of EventDispatcher
+            self.bind(on_release=self.mycallback)
+
+        def mycallback(self, instance):
+            filename = str(self.mytarget)
+            logger.debug("file button text= %s, filename=%s", self.text, filename)
+            # The file existed when the buttons were made. Check it is still
+            # there now rather than checking every file at startup.
+            if not os.path.isfile(filename):
+                logger.warning("Not running %s since it no longer exists.", filename)
+                Popup(
+                    title="File not found",
+                    content=Label(text=filename),
+                    size_hint=(None, None),
+                    size=(min(0.95 * Window.width, dp(500)), "150dp"),
+                ).open()
+                return
+            run_program(myconfig["filebuttons"]["program"], filename)
+
+    class MyAppButton(Button):
+        """Style for App control buttons. The style is in the kv rules."""
+
+    class ScrollableLabel(ScrollView):
+        text = StringProperty("")
+
+    class FilebuttonsApp(App):
+        new_folder = None  # todo- should this be an object property?
+
+        # Settings used by the kv rules for the buttons.
+        button_width = NumericProperty(0)
+        short_button = NumericProperty(0)
+        folder_text_color = ColorProperty()
+        folder_background_color = ColorProperty()
+        file_text_color = ColorProperty()
+        file_background_color = ColorProperty()
+        font_family = StringProperty("")
+        font_size = NumericProperty(14)
+
+        def get_application_config(self):
+            """Tell the App the name of the .ini config file."""
+            configfile = super(FilebuttonsApp, self).get_application_config(
+                str(startup.inifilepath)
+            )
+            logger.debug("App.get_application_config- config file is %s", configfile)
+            return configfile
+
+        def build_config(self, config):
+            """Override App's."""
+            logger.debug("App.build_config-")
+
+            # Save the in-memory configuration myconfig settings
+            # as app configuration defalults.
+            for section, options in myconfig.items():
+                config.setdefaults(section, options)
+
+            # Also set defaults for keys referenced after App.run().
+            config.setdefaults(
+                "filebuttons",
+                {
+                    "window_title": "filebuttons",
+                    "program": "code",  # Visual Studio Code
+                    "folder_background_color": "#0c0c0cff",
+                    "folder_text_color": "#00a57fff",
+                    "file_background_color": "#595959ff",
+                    "file_text_color": "#00b200ff",
+                    "font_family": "CourierNew",
+                    "font_size": 14,
+                    "skip_empty_files": 1,
+                },
             )
-        )
 
-        Builder.load_string(kv)
-        app_layout = BoxLayout(
-            orientation="horizontal", width=layout_width, padding=3, spacing=3
-        )
+        @staticmethod
+        def set_mainwindow_title(value, *largs):
+            """Set the App's Kivy core window title bar string."""
+            Window.set_title(value)
+
+        def build(self) -> BoxLayout:
+            """Override App's."""
+            logger.debug("App.build-")
+            self.settings_cls = SettingsWithSidebar
+            self.use_kivy_settings = False
+            assert self.config is not None, "Avoid pylance None nag."
+
+            # Set the text appearing in the titlebar of the main window.
+            Clock.schedule_once(
+                partial(
+                    self.set_mainwindow_title,
+                    self.config["filebuttons"]["window_title"],
+                )
+            )
 
-        # App control buttons
-        self.new_folder = MyAddNewFolder(self.config)
-        add_folder_button = MyAppButton(
-            text="Add Folder", on_release=self.new_folder.create_popup
-        )
+            # Set the App properties the button kv rules refer to.
+            settings = self.config["filebuttons"]
+            self.button_width = sizes.button_width
+            self.short_button = sizes.short_button
+            self.folder_text_color = settings["folder_text_color"]
+            self.folder_background_color = settings["folder_background_color"]
+            self.file_text_color = settings["file_text_color"]
+            self.file_background_color = settings["file_background_color"]
+            self.font_family = settings["font_family"]
+            self.font_size = settings["font_size"]
+
+            Builder.load_string(kv)
+            app_layout = BoxLayout(
+                orientation="horizontal",
+                width=startup.layout_width,
+                padding=3,
+                spacing=3,
+            )
 
-        self.screen_pos = MyConfigureScreenPosition(self.config)
-        pos_button = MyAppButton(
-            text="Screen Coordinates", on_release=self.screen_pos.popup_screen_pos
-        )
+            # App control buttons
+            self.new_folder = MyAddNewFolder(self.config)
+            add_folder_button = MyAppButton(
+                text="Add Folder", on_release=self.new_folder.create_popup
+            )
 
-        settings_button = MyAppButton(
-            text="Settings (or press F1)", on_release=self.open_settings
-        )
+            self.screen_pos = MyConfigureScreenPosition(self.config)
+            pos_button = MyAppButton(
+                text="Screen Coordinates", on_release=self.screen_pos.popup_screen_pos
+            )
 
-        quit_button = MyAppButton(text="Quit", on_release=self.stop)
-
-        number_of_file_buttons = 0
-        for column in columns:
-            column_layout = GridLayout(cols=1, spacing=[SPACING])
-            # Add the app control buttons to the top of first column. We reserved
-            # space for them in make_columns() above.
-            if column == columns[0]:
-                column_layout.add_widget(add_folder_button)
-                column_layout.add_widget(pos_button)
-                column_layout.add_widget(settings_button)
-                column_layout.add_widget(quit_button)
-            for cell in column:
-                if cell.target is None:
-                    folder_button = Button(
-                        text=cell.title,
-                        size_hint_x=None,
-                        width=BUTTON_WIDTH,
-                        size_hint_y=None,
-                        height=cell.height,
-                        color=self.config["filebuttons"]["folder_text_color"],
-                        background_color=self.config["filebuttons"][
-                            "folder_background_color"
-                        ],
+            settings_button = MyAppButton(
+                text="Settings (or press F1)", on_release=self.open_settings
+            )
+
+            quit_button = MyAppButton(text="Quit", on_release=self.stop)
+
+            number_of_file_buttons = 0
+            for index, column in enumerate(columns):
+                column_layout = GridLayout(cols=1, spacing=[sizes.spacing])
+                # Add the app control buttons to the top of first column. We reserved
+                # space for them in build_columns() above.
+                if index == 0:
+                    column_layout.add_widget(add_folder_button)
+                    column_layout.add_widget(pos_button)
+                    column_layout.add_widget(settings_button)
+                    column_layout.add_widget(quit_button)
+                for cell in column:
+                    if cell.target is None:
+                        folder_button = Factory.FolderButton(
+                            text=cell.title, height=cell.height
+                        )
+                        column_layout.add_widget(folder_button)
+                    else:
+                        number_of_file_buttons += 1
+                        column_layout.add_widget(
+                            MyFileButton(
+                                mytarget=cell.target,
+                                text=cell.title,
+                                height=cell.height,
+                            )
+                        )
+                app_layout.add_widget(column_layout)
+            logger.info("%d file buttons created.", number_of_file_buttons)
+            return app_layout
+
+        def build_settings(self, settings):
+            """Override App's."""
+            # todo- 4 key error exceptions at app exit time after closing settings.
+            settings.register_type("multilinestring", MyMultiLineSettingString)
+            settings.add_json_panel(
+                "Folders",
+                self.config,
+                data=self.make_folders_json(),
+            )
+            settings.add_json_panel(
+                "Program",
+                self.config,
+                data=self.make_args_json(),
+            )
+            settings.add_json_panel(
+                "Appearance",
+                self.config,
+                data=self.make_appearance_json(),
+            )
+            settings.add_json_panel(
+                "Config file",
+                self.config,
+                data=self.make_configfile_json(),
+            )
+
+        def make_folders_json(self):
+            """Helper returns json panel data for the Folders settings."""
+            setting_list = [
+                {
+                    "type": "title",
+                    "title": (
+                        "Empty means recurse files and folders.\n"
+                        "Click to add globs.\n"
+                        "Suggest add globs to top level folder"
+                        " to avoid expensive recurse.\n"
+                        "Restart App after changes."
+                    ),
+                },
+                {
+                    "type": "bool",
+                    "title": "Skip empty files",
+                    "desc": "Recursed folders stat() each file to find empty files.",
+                    "section": "filebuttons",
+                    "key": "skip_empty_files",
+                },
+            ]
+            assert self.config is not None, "Avoid Pylance nag."
+            for k in self.config["filebuttons.folders"].keys():
+                # Put in a setting for each existing key.
+                if k == ".":
+                    setting_list.append(
+                        {
+                            "type": "multilinestring",
+                            "title": "[b].[/b]",
+                            "desc": "(top level folder)",
+                            "section": "filebuttons.folders",
+                            "key": ".",
+                        }
                     )
-                    column_layout.add_widget(folder_button)
                 else:
-                    number_of_file_buttons += 1
-                    column_layout.add_widget(
-                        MyFileButton(
-                            mytarget=cell.target,
-                            text=cell.title,
-                            height=cell.height,
-                            color=self.config["filebuttons"]["file_text_color"],
-                            background_color=self.config["filebuttons"][
-                                "file_background_color"
-                            ],
-                            font_family=self.config["filebuttons"]["font_family"],
-                            font_size=self.config["filebuttons"]["font_size"],
-                        )
+                    setting_list.append(
+                        {
+                            "type": "multilinestring",
+                            "title": k,
+                            "desc": "",
+                            "section": "filebuttons.folders",
+                            "key": k,
+                        }
                     )
-            app_layout.add_widget(column_layout)
-        print(f"{number_of_file_buttons} file buttons created.")
-        return app_layout
-
-    def build_settings(self, settings):
-        """Override App's."""
-        # todo- 4 key error exceptions at app exit time after closing settings.
-        settings.register_type("multilinestring", MyMultiLineSettingString)
-        settings.add_json_panel(
-            "Folders",
-            self.config,
-            data=self.make_folders_json(),
-        )
-        settings.add_json_panel(
-            "Program",
-            self.config,
-            data=self.make_args_json(),
-        )
-        settings.add_json_panel(
-            "Appearance",
-            self.config,
-            data=self.make_appearance_json(),
-        )
-        settings.add_json_panel(
-            "Config file",
-            self.config,
-            data=self.make_configfile_json(),
-        )
-
-    def make_folders_json(self):
-        """Helper returns json panel data for the Folders settings."""
-        setting_list = [
-            {
-                "type": "title",
-                "title": (
-                    "Empty means recurse files and folders.\n"
-                    "Click to add globs.\n"
-                    "Suggest add globs to top level folder"
-                    " to avoid expensive recurse.\n"
-                    "Restart App after changes."
-                ),
-            }
-        ]
-        assert self.config is not None, "Avoid Pylance nag."
-        for k in self.config["filebuttons.folders"].keys():
-            # Put in a setting for each existing key.
-            if k == ".":
-                setting_list.append(
-                    {
-                        "type": "multilinestring",
-                        "title": "[b].[/b]",
-                        "desc": "(top level folder)",
-                        "section": "filebuttons.folders",
-                        "key": ".",
-                    }
-                )
-            else:
-                setting_list.append(
-                    {
-                        "type": "multilinestring",
-                        "title": k,
-                        "desc": "",
-                        "section": "filebuttons.folders",
-                        "key": k,
-                    }
-                )
-        return json.dumps(setting_list)
-
-    def make_args_json(self):
-        """Helper returns json panel data for the command line arg settings."""
-        setting_list = [
-            {"type": "title", "title": "Restart App after changes."},
-            {
-                "type": "string",
-                "title": "Program name.",
-                "desc": "Program to call with file.",
-                "section": "filebuttons",
-                "key": "program",
-            },
-        ]
-        return json.dumps(setting_list)
-
-    # todo- need window_height from config, currently gets from geometry?
-    def make_appearance_json(self):
-        """Helper returns json panel data for the appearance settings."""
-        setting_list = [
-            {"type": "title", "title": "Restart App after changes."},
-            {
-                "type": "string",
-                "title": "Main window title",
-                "desc": "",
-                "section": "filebuttons",
-                "key": "window_title",
-            },
-            {
-                "type": "color",
-                "title": "Folder button background color",
-                "desc": "",
-                "section": "filebuttons",
-                "key": "folder_background_color",
-            },
-            {
-                "type": "color",
-                "title": "Folder button text color",
-                "desc": "",
-                "section": "filebuttons",
-                "key": "folder_text_color",
-            },
-            {
-                "type": "color",
-                "title": "File button background color",
-                "desc": "",
-                "section": "filebuttons",
-                "key": "file_background_color",
-            },
-            {
-                "type": "color",
-                "title": "File button text color",
-                "desc": "",
-                "section": "filebuttons",
-                "key": "file_text_color",
-            },
-            {
-                "type": "numeric",
-                "title": "Window height",
-                "desc": "pixels",
-                "section": "filebuttons",
-                "key": "window_height",
-            },
-            {
-                "type": "numeric",
-                "title": "Button width",
-                "desc": "pixels",
-                "section": "filebuttons",
-                "key": "button_width",
-            },
-            {
-                "type": "numeric",
-                "title": "Button spacing",
-                "desc": "Space between buttons in pixels",
-                "section": "filebuttons",
-                "key": "spacing",
-            },
-            {
-                "type": "numeric",
-                "title": "Short button height",
-                "desc": "Height of single line button in pixels",
-                "section": "filebuttons",
-                "key": "short_button_height",
-            },
-            {
-                "type": "numeric",
-                "title": "Tall button height",
-                "desc": "Height of 2 line button in pixels",
-                "section": "filebuttons",
-                "key": "tall_button_height",
-            },
-            {
-                "type": "numeric",
-                "title": "Button text wrap width",
-                "desc": "characters",
-                "section": "filebuttons",
-                "key": "text_wrap_width",
-            },
-            {
-                "type": "string",
-                "title": "Font",
-                "desc": "File button text font family",
-                "section": "filebuttons",
-                "key": "font_family",
-            },
-            {
-                "type": "numeric",
-                "title": "Font Size",
-                "desc": "File button text font size in pixels",
-                "section": "filebuttons",
-                "key": "font_size",
-            },
-        ]
-        return json.dumps(setting_list)
-
-    def make_configfile_json(self):
-        """Helper returns json panel data showing the config file location."""
-        setting_list = [
-            {
-                "type": "title",
-                "title": "Configuation file name (read only).",
-            },
-            {
-                "type": "title",
-                "title": str(inifilepath),
-            },
-        ]
-        return json.dumps(setting_list)
+            return json.dumps(setting_list)
+
+        def make_args_json(self):
+            """Helper returns json panel data for the command line arg settings."""
+            setting_list = [
+                {"type": "title", "title": "Restart App after changes."},
+                {
+                    "type": "string",
+                    "title": "Program name.",
+                    "desc": "Program to call with file.",
+                    "section": "filebuttons",
+                    "key": "program",
+                },
+            ]
+            return json.dumps(setting_list)
+
+        # todo- need window_height from config, currently gets from geometry?
+        def make_appearance_json(self):
+            """Helper returns json panel data for the appearance settings."""
+            setting_list = [
+                {"type": "title", "title": "Restart App after changes."},
+                {
+                    "type": "string",
+                    "title": "Main window title",
+                    "desc": "",
+                    "section": "filebuttons",
+                    "key": "window_title",
+                },
+                {
+                    "type": "color",
+                    "title": "Folder button background color",
+                    "desc": "",
+                    "section": "filebuttons",
+                    "key": "folder_background_color",
+                },
+                {
+                    "type": "color",
+                    "title": "Folder button text color",
+                    "desc": "",
+                    "section": "filebuttons",
+                    "key": "folder_text_color",
+                },
+                {
+                    "type": "color",
+                    "title": "File button background color",
+                    "desc": "",
+                    "section": "filebuttons",
+                    "key": "file_background_color",
+                },
+                {
+                    "type": "color",
+                    "title": "File button text color",
+                    "desc": "",
+                    "section": "filebuttons",
+                    "key": "file_text_color",
+                },
+                {
+                    "type": "numeric",
+                    "title": "Window height",
+                    "desc": "pixels",
+                    "section": "filebuttons",
+                    "key": "window_height",
+                },
+                {
+                    "type": "numeric",
+                    "title": "Button width",
+                    "desc": "pixels",
+                    "section": "filebuttons",
+                    "key": "button_width",
+                },
+                {
+                    "type": "numeric",
+                    "title": "Button spacing",
+                    "desc": "Space between buttons in pixels",
+                    "section": "filebuttons",
+                    "key": "spacing",
+                },
+                {
+                    "type": "numeric",
+                    "title": "Short button height",
+                    "desc": "Height of single line button in pixels",
+                    "section": "filebuttons",
+                    "key": "short_button_height",
+                },
+                {
+                    "type": "numeric",
+                    "title": "Tall button height",
+                    "desc": "Height of 2 line button in pixels",
+                    "section": "filebuttons",
+                    "key": "tall_button_height",
+                },
+                {
+                    "type": "numeric",
+                    "title": "Button text wrap width",
+                    "desc": "characters",
+                    "section": "filebuttons",
+                    "key": "text_wrap_width",
+                },
+                {
+                    "type": "string",
+                    "title": "Font",
+                    "desc": "File button text font family",
+                    "section": "filebuttons",
+                    "key": "font_family",
+                },
+                {
+                    "type": "numeric",
+                    "title": "Font Size",
+                    "desc": "File button text font size in pixels",
+                    "section": "filebuttons",
+                    "key": "font_size",
+                },
+            ]
+            return json.dumps(setting_list)
+
+        def make_configfile_json(self):
+            """Helper returns json panel data showing the config file location."""
+            setting_list = [
+                {
+                    "type": "title",
+                    "title": "Configuation file name (read only).",
+                },
+                {
+                    "type": "title",
+                    "title": str(startup.inifilepath),
+                },
+            ]
+            return json.dumps(setting_list)
+
+    return FilebuttonsApp
 
 
 def main():
     """Entry point for the application script."""
+    # Kivy is first imported here, not when this module is imported.
+    # Kivy takes arguments before the "--" on the command line from argv.
+    # Kivy leaves argv[0] in place and any arguments after the "--"
+    # immediately follow argv[0].
+    from kivy.config import Config
+
+    startup = _bootstrap(sys.argv[1:])
+
+    # Set kivy screen position and height of the window
+    logger.debug("set graphics-")
+    settings = startup.config["filebuttons"]
+    Config.set("graphics", "min_state_time", 0.0)
+    Config.set("graphics", "width", startup.layout_width)
+    Config.set("graphics", "height", startup.window_height)
+    Config.set("graphics", "position", "custom")
+    Config.set("graphics", "left", int(settings["screen_position_left"]))
+    Config.set("graphics", "top", int(settings["screen_position_top"]))
+
+    FilebuttonsApp = kivy_app_class(startup)
     FilebuttonsApp().run()
 
 
@@ -1,12 +1,11 @@
-"""Test code run at kv.py import time.
+"""Test reading the config file and laying out the buttons.
 
-This test is only valid the first time it is run in a given
-Python interpreter instance.
+Importing kv.py does not import Kivy.
 We don't run the App.
 """
 
-import contextlib
 import sys
+import tempfile
 import unittest
 from pathlib import Path
 from unittest import mock
@@ -14,56 +13,225 @@ from unittest import mock
 
 class TestCallersConfig(unittest.TestCase):
 
-    @unittest.skipIf(sys.version_info < (3, 11), "for 3.11+")
     def test_with_callers_config(self):
         """Test user supplied config file processing."""
 
-        # value for sys.argv when importing kv.py
+        # program arguments, these follow the "--" on the command line
+        # The folders are relative to --base-dir rather than the current
+        # working directory.
         arglist = [
-            "testcaseprog",
-            "--",  # tell kivy following args are for the App
             "--config",
-            "../config_files/aproject.ini",
+            "docs/config_files/aproject.ini",
+            "--base-dir",
+            "docs/aproject",
         ]
-        # filebuttons looks for files relative to the current working directory.
-        with contextlib.chdir("docs/aproject"):
-            print("\ncwd= ", Path.cwd())
-            with mock.patch("sys.argv", arglist):
-                import filebuttons.kv as kv
-
-                print(f"number of columns= {kv.num_columns}")
-                for c in kv.columns:
-                    print(f"--- column {len(c)} items ---")
-                    for d in c:
-                        if d.target is None:
-                            print(d.title)
-                        else:
-                            print(d)
-                # No buttons for filename with disallowed sunbtrings.
-                self.assertTrue(kv.filename_ok("abc"))
-                self.assertTrue(kv.filename_ok("abc/def"))
-                self.assertTrue(kv.filename_ok("abc/def.py"))
-                self.assertFalse(kv.filename_ok("abc/def\n.py"))
-                self.assertFalse(kv.filename_ok("\nabc/def.py"))
-                self.assertFalse(kv.filename_ok("abc/def.py\n"))
-                self.assertFalse(kv.filename_ok("abc||.py"))
-                self.assertFalse(kv.filename_ok("abc&&.py"))
-                self.assertFalse(kv.filename_ok("abc ; .py"))
-
-                # wrapping logic at 22 characters (TEXT_WRAP_WIDTH)
-                self.assertEqual(kv.wrap("a"), "a")
-                # no wrap
-                self.assertEqual(
-                    kv.wrap("1234567890123456789012"), "1234567890123456789012"
-                )
-                # 1 char too long, first part is the longer part
-                self.assertEqual(
-                    kv.wrap("12345678901234567890123"), "123456789012\n34567890123"
-                )
-                # 2 char too long
-                self.assertEqual(
-                    kv.wrap("123456789012345678901234"), "123456789012\n345678901234"
-                )
+        import filebuttons.kv as kv
+
+        startup = kv._bootstrap(arglist)
+        print(f"number of columns= {len(startup.columns)}")
+        for c in startup.columns:
+            print(f"--- column {len(c)} items ---")
+            for d in c:
+                if d.target is None:
+                    print(d.title)
+                else:
+                    print(d)
+        self.assertEqual(startup.columns[0][4].title, ".github/workflows")
+        self.assertEqual(
+            startup.columns[0][5].target,
+            Path("docs/aproject/.github/workflows/release.yml"),
+        )
+        self.assertIsInstance(startup.columns[0], tuple)
+        # The unchanged config file is parsed once.
+        self.assertIs(kv._bootstrap(arglist).config, startup.config)
+        kv._load_config.cache_clear()
+        self.assertIsNot(kv._bootstrap(arglist).config, startup.config)
+
+        # No buttons for filename with disallowed sunbtrings.
+        self.assertTrue(kv.filename_ok("abc"))
+        self.assertTrue(kv.filename_ok("abc/def"))
+        self.assertTrue(kv.filename_ok("abc/def.py"))
+        self.assertFalse(kv.filename_ok("abc/def\n.py"))
+        self.assertFalse(kv.filename_ok("\nabc/def.py"))
+        self.assertFalse(kv.filename_ok("abc/def.py\n"))
+        self.assertFalse(kv.filename_ok("abc||.py"))
+        self.assertFalse(kv.filename_ok("abc&&.py"))
+        self.assertFalse(kv.filename_ok("abc ; .py"))
+
+        # wrapping logic at 22 characters (text_wrap_width)
+        width = startup.sizes.text_wrap_width
+        self.assertEqual(width, 22)
+        self.assertEqual(kv.wrap("a", width), "a")
+        # default width is the default text_wrap_width setting
+        self.assertEqual(kv.TEXT_WRAP_WIDTH, 22)
+        self.assertEqual(kv.wrap("a" * 23), "a" * 12 + "\n" + "a" * 11)
+        # no wrap
+        self.assertEqual(
+            kv.wrap("1234567890123456789012", width), "1234567890123456789012"
+        )
+        # 1 char too long, first part is the longer part
+        self.assertEqual(
+            kv.wrap("12345678901234567890123", width),
+            "123456789012\n34567890123",
+        )
+        # 2 char too long
+        self.assertEqual(
+            kv.wrap("123456789012345678901234", width),
+            "123456789012\n345678901234",
+        )
+        # the lines before joining
+        self.assertEqual(kv.wrap_pair("a", width), ("a",))
+        self.assertEqual(
+            kv.wrap_pair("12345678901234567890123", width),
+            ("123456789012", "34567890123"),
+        )
+
+
+class TestGlobs(unittest.TestCase):
+
+    def test_recursive_glob(self):
+        """Test a ** glob finds files in hidden folders."""
+        import filebuttons.kv as kv
+
+        cells = list(kv.emit_from_globs("docs/aproject", "root", ["**/*.yml"]))
+        self.assertEqual(cells[0], kv.Cell(title="root"))
+        self.assertEqual(
+            [c.target for c in cells[1:]],
+            [
+                Path("docs/aproject/.github/workflows/release.yml"),
+                Path("docs/aproject/.github/workflows/test.yml"),
+            ],
+        )
+
+
+class TestParseIni(unittest.TestCase):
+
+    def test_parse_ini(self):
+        """Test the ini subset configparser writes and the errors it raises."""
+        import filebuttons.kv as kv
+
+        text = """\
+[filebuttons.folders]
+; comment
+. = *.md
+    *.txt
+src: *.py
+
+[filebuttons]
+Program = code
+"""
+        self.assertEqual(
+            kv.parse_ini(text),
+            {
+                "filebuttons.folders": {".": "*.md\n*.txt", "src": "*.py"},
+                "filebuttons": {"program": "code"},
+            },
+        )
+        # configparser ignores text after a section header and keeps
+        # blank lines inside a multiline value.
+        text = "[sec] ; c\nk = a\n\n    b\n"
+        self.assertEqual(kv.parse_ini(text), {"sec": {"k": "a\n\nb"}})
+        with self.assertRaisesRegex(ValueError, "line 2: expected key = value"):
+            kv.parse_ini("[filebuttons.folders]\nsrc\n")
+        with self.assertRaisesRegex(ValueError, "line 3: duplicate key"):
+            kv.parse_ini("[filebuttons]\nprogram = a\nPROGRAM = b\n")
+        with self.assertRaisesRegex(ValueError, "line 1: key before"):
+            kv.parse_ini("program = code\n")
+
+
+class TestWalkProject(unittest.TestCase):
+
+    def test_file_no_longer_empty(self):
+        """Test a later walk sees a file that got content."""
+        import filebuttons.kv as kv
+
+        config = {"filebuttons": {}, "filebuttons.folders": {"p": ""}}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            base_dir = Path(tmpdir)
+            (base_dir / "p").mkdir()
+            textfile = base_dir / "p" / "a.txt"
+            textfile.write_text("", encoding="utf-8")
+            self.assertEqual(list(kv.walk_project(config, base_dir)), [])
+            textfile.write_text("a", encoding="utf-8")
+            titles = [c.title for c in kv.walk_project(config, base_dir)]
+            self.assertEqual(titles, ["p", "a.txt"])
+
+    def test_missing_folder(self):
+        """Test missing folders are skipped whatever kind of globs they have."""
+        import filebuttons.kv as kv
+
+        folders = {"missing": "**/*.md", "missing2": "sub/*.md", "missing3": "*.md"}
+        config = {"filebuttons": {}, "filebuttons.folders": folders}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with self.assertLogs(kv.logger, "WARNING") as logs:
+                cells = list(kv.walk_project(config, Path(tmpdir)))
+        self.assertEqual(cells, [])
+        self.assertEqual(len(logs.output), 3)
+
+    def test_unreadable_folder(self):
+        """Test folders that can't be listed are skipped."""
+        import filebuttons.kv as kv
+
+        folders = {"p": "*.md", "q": ""}
+        config = {"filebuttons": {}, "filebuttons.folders": folders}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "p").mkdir()
+            (Path(tmpdir) / "q").mkdir()
+            # Root can list any folder so make the listing fail instead.
+            with mock.patch.object(kv.os, "scandir", side_effect=PermissionError):
+                with self.assertLogs(kv.logger, "WARNING") as logs:
+                    cells = list(kv.walk_project(config, Path(tmpdir)))
+        self.assertEqual(cells, [])
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn("can't be read", logs.output[0])
+
+
+def greedy_column_count(cells, window_height, sizes):
+    """Number of columns from filling each column until it overflows."""
+    capacity = window_height - 4 * (sizes.short_button + sizes.spacing)
+    count = 1
+    for cell in cells:
+        space_required = cell.height + sizes.spacing
+        if space_required <= capacity:
+            capacity -= space_required
+        else:
+            count += 1
+            capacity = window_height - space_required
+    return count
+
+
+class TestBuildColumns(unittest.TestCase):
+
+    def test_build_columns(self):
+        """Test the columns are as few as a greedy fill and not overfilled."""
+        import filebuttons.kv as kv
+
+        sizes = kv.Sizes(
+            button_width=160,
+            short_button=18,
+            tall_button=33,
+            spacing=3,
+            text_wrap_width=22,
+        )
+        titles = ["a" * (5 + (i * 7) % 30) for i in range(40)]
+        unsized = [kv.Cell(title=t) for t in titles]
+        cells = list(kv.size_cells(iter(unsized), sizes))
+        for window_height in (84, 90, 100, 150, 200, 333, 1000):
+            columns = kv.build_columns(iter(unsized), window_height, sizes)
+            self.assertEqual(
+                len(columns), greedy_column_count(cells, window_height, sizes)
+            )
+            self.assertEqual([c for column in columns for c in column], cells)
+            capacity = window_height - 4 * (sizes.short_button + sizes.spacing)
+            for column in columns:
+                used = sum(c.height + sizes.spacing for c in column)
+                self.assertLessEqual(used, capacity)
+                capacity = window_height
+            if window_height < 200:
+                self.assertGreater(len(columns), 2)
+        # No room for a cell under the app buttons, they get the first column.
+        columns = kv.build_columns(iter(unsized), 100, sizes)
+        self.assertEqual(columns[0], ())
 
 
 class TestDefaultConfig(unittest.TestCase):
@@ -114,15 +282,16 @@ font_size = 14
         configfile.write_text(text, encoding="utf-8")
         import filebuttons.kv as kv
 
-        print(f"number of columns= {kv.num_columns}")
-        for c in kv.columns:
+        startup = kv._bootstrap([])
+        print(f"number of columns= {len(startup.columns)}")
+        for c in startup.columns:
             print(f"--- column {len(c)} items ---")
             for d in c:
                 if d.target is None:
                     print(d.title)
                 else:
                     print(d)
-        self.assertEqual(kv.num_columns, 1)
+        self.assertEqual(len(startup.columns), 1)
         self.assertEqual(len(c), 12)
 
 